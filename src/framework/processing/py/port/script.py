@@ -4,12 +4,16 @@ from port.api.commands import CommandSystemDonate, CommandSystemExit, CommandUIR
 
 import dateutil.parser
 import pandas as pd
+import numpy as np
 import zipfile
 import json
-from urllib.parse import urlparse, parse_qs
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse, unquote_plus
+from html.parser import HTMLParser
 import dateutil.tz
 import io
+import itertools
+import re
+import sys
 
 import logging
 
@@ -19,14 +23,23 @@ import logging
 class DataFrameHandler(logging.Handler):
     def __init__(self):
         logging.Handler.__init__(self)
-        self._data = []
+        self._levels = []
+        self._messages = []
 
     def emit(self, record):
-        self._data.append({"Level": record.levelname, "Message": record.getMessage()})
+        self._levels.append(record.levelname)
+        self._messages.append(record.getMessage())
 
     @property
     def df(self):
-        return pd.DataFrame(self._data)
+        return pd.DataFrame({"Level": self._levels, "Message": self._messages})
+
+    def as_dict(self):
+        # Same shape as df.to_dict(), without building a data frame
+        return {
+            "Level": dict(enumerate(self._levels)),
+            "Message": dict(enumerate(self._messages)),
+        }
 
 
 # Set up in logging using the dataframe handler
@@ -43,6 +56,35 @@ end_dt = pd.to_datetime("2025-03-02").tz_localize("CET") + pd.Timedelta(
     days=1
 )  # Include all of March 2nd
 
+# Matches the Google homepage on any Google TLD, with or without a query;
+# like urlparse, only the scheme is matched case-insensitively
+google_homepage_url = re.compile(r"(?i:https?)://www\.google\.[^/?#]+/?(?:[?#]|$)")
+
+# Fields every Takeout activity record needs to be processed
+required_keys = frozenset(["header", "title", "titleUrl", "time", "products"])
+
+# Product names Google Takeout uses for search activity (English and German)
+search_products = frozenset(["Search", "Google Suche"])
+
+# Markers around the titles of clicked results (English and German)
+visited_prefix = "Visited "
+visited_suffix = " aufgerufen"
+
+# Titles of results that were only viewed, not clicked (English and German)
+viewed_prefixes = ("Viewed ",)
+viewed_suffixes = (" angesehen",)
+
+# Start of a title that is a bare http(s) URL; urlparse ignores leading
+# control characters and spaces and the case of the scheme
+url_title = re.compile(r"[\x00-\x20]*https?://", re.IGNORECASE)
+
+# Matches URLs on any Google TLD (e.g. www.google.com, www.google.de) and
+# captures path and query, so each URL is scanned only once to classify it;
+# like urlparse, only the scheme is matched case-insensitively
+google_url = re.compile(
+    r"(?i:https?)://www\.google\.[^/?#]+(?P<path>/[^?#]*)?(?:\?(?P<query>[^#]*))?"
+)
+
 
 def process(sessionId):
     key = "google-search-history"
@@ -64,8 +106,10 @@ def process(sessionId):
                 if zipfile_ref == "invalid":
                     raise zipfile.BadZipFile("Invalid zip file")
 
-                # Find and parse the Google Search export
-                json_data = find_google_search_export(zipfile_ref)
+                # Find and parse the Google Search export; closing the
+                # ZipFile leaves the file it was opened on open, so close both
+                with zipfile_ref.fp, zipfile_ref:
+                    json_data = find_google_search_export(zipfile_ref)
                 logger.info(f"{key}: found valid Google Takeout data")
 
                 # Extract search history and clicks into dataframes
@@ -108,105 +152,126 @@ def process(sessionId):
             yield donate(f"{sessionId}-{key}", consent_result.value)
         if consent_result.__type__ == "PayloadFalse":
             value = json.dumps(
-                {"status": "donation declined", "log": log_handler.df.to_dict()}
+                {"status": "donation declined", "log": log_handler.as_dict()}
             )
             yield donate(f"{sessionId}-{key}", value)
 
 
-def render_donation_page(body):
-    header = props.PropsUIHeader(
-        props.Translatable(
-            {
-                "en": "Google Search History",
-                "de": "Google Suchverlauf",
-                "nl": "Google Zoekgeschiedenis",
-            }
-        )
-    )
-
-    page = props.PropsUIPageDonation("Zip", header, body)
-    return CommandUIRender(page)
-
-
-def render_no_search_data_page():
-    header = props.PropsUIHeader(
-        props.Translatable(
-            {
-                "en": "No Google Search Data",
-                "de": "Keine Google Suchdaten",
-                "nl": "Geen Google Zoekgegevens",
-            }
-        )
+# The pages below never change, so their props are built once at import
+donation_header = props.PropsUIHeader(
+    props.Translatable(
+        {
+            "en": "Google Search History",
+            "de": "Google Suchverlauf",
+            "nl": "Google Zoekgeschiedenis",
+        }
     )
+)
 
-    body = props.PropsUIPromptConfirm(
-        text=props.Translatable(
-            {
-                "en": "Your data package does not contain any Google search data, either because you did not request it during data export, or your privacy settings at Google are set this way. By clicking End, you can complete your study participation.",
-                "de": "Ihr Datenpaket enthält keine Google Suchdaten, da Sie diese entweder beim Datenexport nicht angefordert haben, oder Ihre Privatsphäre-Einstellungen bei Google dies so festlegen. Mit Klicken auf Beenden können Sie Ihre Studienteilnahme abschließen.",
-                "nl": "Uw datapakket bevat geen Google-zoekgegevens, omdat u deze niet hebt aangevraagd tijdens de gegevensexport, of omdat uw privacy-instellingen bij Google zo zijn ingesteld. Door op Beëindigen te klikken, kunt u uw deelname aan de studie voltooien.",
-            }
-        ),
-        ok=props.Translatable(
-            {
-                "en": "End",
-                "de": "Beenden",
-                "nl": "Beëindigen",
-            }
-        ),
+no_search_data_header = props.PropsUIHeader(
+    props.Translatable(
+        {
+            "en": "No Google Search Data",
+            "de": "Keine Google Suchdaten",
+            "nl": "Geen Google Zoekgegevens",
+        }
     )
-    page = props.PropsUIPageDonation("NoGoogleSearchData", header, body)
-    return CommandUIRender(page)
+)
 
+no_search_data_prompt = props.PropsUIPromptConfirm(
+    text=props.Translatable(
+        {
+            "en": "Your data package does not contain any Google search data, either because you did not request it during data export, or your privacy settings at Google are set this way. By clicking End, you can complete your study participation.",
+            "de": "Ihr Datenpaket enthält keine Google Suchdaten, da Sie diese entweder beim Datenexport nicht angefordert haben, oder Ihre Privatsphäre-Einstellungen bei Google dies so festlegen. Mit Klicken auf Beenden können Sie Ihre Studienteilnahme abschließen.",
+            "nl": "Uw datapakket bevat geen Google-zoekgegevens, omdat u deze niet hebt aangevraagd tijdens de gegevensexport, of omdat uw privacy-instellingen bij Google zo zijn ingesteld. Door op Beëindigen te klikken, kunt u uw deelname aan de studie voltooien.",
+        }
+    ),
+    ok=props.Translatable(
+        {
+            "en": "End",
+            "de": "Beenden",
+            "nl": "Beëindigen",
+        }
+    ),
+)
 
-def retry_confirmation():
-    text = props.Translatable(
+retry_prompt = props.PropsUIPromptConfirm(
+    props.Translatable(
         {
             "en": "Unfortunately, we cannot process your file. Continue, if you are sure that you selected the right file. Try again to select a different file.",
             "de": "Leider können wir Ihre Datei nicht bearbeiten. Fahren Sie fort, wenn Sie sicher sind, dass Sie die richtige Datei ausgewählt haben. Versuchen Sie, eine andere Datei auszuwählen.",
             "nl": "Helaas, kunnen we uw bestand niet verwerken. Weet u zeker dat u het juiste bestand heeft gekozen? Ga dan verder. Probeer opnieuw als u een ander bestand wilt kiezen.",
         }
-    )
-    ok = props.Translatable(
+    ),
+    props.Translatable(
         {
             "en": "Try again",
             "de": "Versuchen Sie es noch einmal",
             "nl": "Probeer opnieuw",
         }
-    )
-    cancel = props.Translatable({"en": "Continue", "de": "Weiter", "nl": "Verder"})
-    return props.PropsUIPromptConfirm(text, ok, cancel)
+    ),
+    props.Translatable({"en": "Continue", "de": "Weiter", "nl": "Verder"}),
+)
 
 
-def prompt_file(extensions):
-    description = props.Translatable(
-        {
-            "en": "Please select the zip file that you downloaded with your Google search history.",
-            "de": "Wählen Sie bitte die heruntergeladene ZIP Datei aus mit Ihren Google Suchverlauf.",
-            "nl": "Selecteer een willekeurige zip file die u heeft opgeslagen op uw apparaat.",
-        }
+def render_donation_page(body):
+    page = props.PropsUIPageDonation("Zip", donation_header, body)
+    return CommandUIRender(page)
+
+
+def render_no_search_data_page():
+    page = props.PropsUIPageDonation(
+        "NoGoogleSearchData", no_search_data_header, no_search_data_prompt
     )
+    return CommandUIRender(page)
 
-    return props.PropsUIPromptFileInput(description, extensions)
+
+def retry_confirmation():
+    return retry_prompt
+
+
+file_prompt_description = props.Translatable(
+    {
+        "en": "Please select the zip file that you downloaded with your Google search history.",
+        "de": "Wählen Sie bitte die heruntergeladene ZIP Datei aus mit Ihren Google Suchverlauf.",
+        "nl": "Selecteer een willekeurige zip file die u heeft opgeslagen op uw apparaat.",
+    }
+)
+
+extraction_description = props.Translatable(
+    {
+        "en": "One moment please. Information is now being extracted from the selected file.",
+        "de": "Einen Moment bitte. Es werden nun Informationen aus der ausgewählten Datei extrahiert.",
+        "nl": "Een moment geduld. Informatie wordt op dit moment uit het geselecteerde bestaand gehaald.",
+    }
+)
+
+
+def prompt_file(extensions):
+    return props.PropsUIPromptFileInput(file_prompt_description, extensions)
 
 
 def prompt_extraction_message(message, percentage):
-    description = props.Translatable(
-        {
-            "en": "One moment please. Information is now being extracted from the selected file.",
-            "de": "Einen Moment bitte. Es werden nun Informationen aus der ausgewählten Datei extrahiert.",
-            "nl": "Een moment geduld. Informatie wordt op dit moment uit het geselecteerde bestaand gehaald.",
-        }
-    )
+    return props.PropsUIPromptProgress(extraction_description, message, percentage)
+
 
-    return props.PropsUIPromptProgress(description, message, percentage)
+# Read buffer for the selected archive. In the browser every read of the file
+# is a separate read from the mounted Blob, and the zip reader issues many
+# small ones, so they are served from large blocks instead
+zip_read_buffer_size = 1024 * 1024
 
 
 def get_zipfile(filename):
+    f = open(filename, "rb", buffering=zip_read_buffer_size)
     try:
-        return zipfile.ZipFile(filename)
+        return zipfile.ZipFile(f)
     except (zipfile.BadZipFile, zipfile.LargeZipFile) as e:
+        f.close()
         return "invalid"
+    except BaseException:
+        # ZipFile does not close a file it was given, not even on failure
+        f.close()
+        raise
 
 
 def get_files(zipfile_ref):
@@ -225,27 +290,28 @@ def extract_file(zipfile_ref, filename):
         return "invalid"
 
 
-def prompt_consent(data, meta_data):
-    search_title = props.Translatable(
-        {
-            "en": "Search terms",
-            "de": "Suchbegriffe",
-            "nl": "Zoektermen",
-        }
-    )
+search_title = props.Translatable(
+    {
+        "en": "Search terms",
+        "de": "Suchbegriffe",
+        "nl": "Zoektermen",
+    }
+)
 
-    clicks_title = props.Translatable(
-        {
-            "en": "Clicked search results",
-            "de": "Angeklickte Suchergebnisse",
-            "nl": "Aangeklikte zoekresultaten",
-        }
-    )
+clicks_title = props.Translatable(
+    {
+        "en": "Clicked search results",
+        "de": "Angeklickte Suchergebnisse",
+        "nl": "Aangeklikte zoekresultaten",
+    }
+)
 
-    log_title = props.Translatable(
-        {"en": "Log messages", "de": "Log Nachrichten", "nl": "Log berichten"}
-    )
+log_title = props.Translatable(
+    {"en": "Log messages", "de": "Log Nachrichten", "nl": "Log berichten"}
+)
 
+
+def prompt_consent(data, meta_data):
     tables = []
     if isinstance(data, tuple) and len(data) == 2:
         searches_df, clicks_df = data
@@ -268,6 +334,31 @@ def exit(code, info):
     return CommandSystemExit(code, info)
 
 
+def google_query_param(match):
+    """
+    Return the q parameter of a URL matched by google_url, or None.
+
+    Only the one parameter is looked for, instead of decoding the whole query
+    string with parse_qs. Like parse_qs, empty values are skipped.
+    """
+    query = match["query"]
+    if not query:
+        return None
+
+    start = query.find("q=")
+    while start >= 0:
+        if start == 0 or query[start - 1] == "&":
+            end = query.find("&", start + 2)
+            value = query[start + 2 :] if end < 0 else query[start + 2 : end]
+            if value:
+                # Most values have no percent escapes; skip the decoder then
+                if "%" not in value:
+                    return value.replace("+", " ")
+                return unquote_plus(value)
+        start = query.find("q=", start + 1)
+    return None
+
+
 def is_google_search_url(url):
     """
     Determine if a URL is a Google search URL.
@@ -283,112 +374,150 @@ def is_google_search_url(url):
         if not url:  # Handle None or empty string
             return False, None
 
-        parsed_url = urlparse(url)
-        if not parsed_url.netloc:  # Handle invalid URLs
-            return False, None
-
-        # Check if domain is a Google domain (e.g., www.google.com, www.google.de)
-        if parsed_url.netloc.startswith("www.google.") and parsed_url.path == "/search":
-            query_params = parse_qs(parsed_url.query)
-            if "q" in query_params:
-                return True, query_params["q"][0]
+        match = google_url.match(url)
+        if match and match["path"] == "/search":
+            query = google_query_param(match)
+            if query is not None:
+                return True, query
     except (ValueError, AttributeError, TypeError) as e:
         pass
     return False, None
 
 
+def classify_activity_url(url):
+    """
+    Classify the URL of a search activity record in a single scan.
+
+    Google redirect URLs (/url?q=...) are resolved to their target first.
+
+    Args:
+        url: URL string of the activity record
+
+    Returns:
+        tuple: (query, link) where query is the search term for Google
+        searches and None for clicked results, and link is the resolved URL
+    """
+    match = google_url.match(url)
+    if match is None:  # Most clicked results are on other sites
+        return None, url
+
+    if match["path"] == "/url":
+        target = google_query_param(match)
+        if target is None:
+            return None, url
+        return is_google_search_url(target)[1], target
+
+    if match["path"] == "/search":
+        return google_query_param(match), url
+    return None, url
+
+
 def extract_search_data(data):
     if not isinstance(data, list):
         return pd.DataFrame(columns=["Datum", "Nummer", "Suchbegriff"]), pd.DataFrame(
             columns=["Datum", "Nummer", "Suchergebnis", "Link"]
         )
 
-    searches = []
-    clicks = []
-
-    def resolve_google_redirect(url):
-        parsed = urlparse(url)
-        if parsed.netloc.startswith("www.google.") and parsed.path == "/url":
-            query = parse_qs(parsed.query)
-            if "q" in query:
-                return query["q"][0]
-        return url
+    # One list per output column, so the frames are built column-wise
+    search_dates, search_numbers, search_terms = [], [], []
+    click_dates, click_numbers, click_titles, click_links = [], [], [], []
 
     def format_title(title):
+        # Most titles are page names, not URLs; only parse the ones that can
+        # have an http(s) scheme
+        if not url_title.match(title):
+            return title
         try:
             parsed = urlparse(title)
             # Check if it looks like a URL - must have netloc (domain) and valid scheme
             if parsed.netloc and parsed.scheme in ("http", "https"):
-                # Remove 'www.' prefix if it exists
-                return parsed.netloc.replace("www.", "", 1)
+                # Remove 'www.' prefix if it exists; the same few domains
+                # recur throughout, so they share one string each
+                return sys.intern(parsed.netloc.replace("www.", "", 1))
             return title
         except (ValueError, AttributeError) as e:
             return title
 
-    def is_google_homepage(url):
-        parsed = urlparse(url)
-        return parsed.netloc.startswith("www.google.") and parsed.path in ["/", ""]
-
-    records = []
+    # Fields of the records that pass the filter; the input is not modified
+    times, titles, urls = [], [], []
     for item in data:
-        if not all(
-            key in item for key in ["header", "title", "titleUrl", "time", "products"]
-        ):
-            continue
-
         try:
-            timestamp = pd.to_datetime(item["time"])
-
-            # Ensure consistent timezone comparison
-            if timestamp.tz is None:
-                timestamp = timestamp.tz_localize("UTC")
-            if timestamp.tz.zone != "CET":
-                timestamp = timestamp.tz_convert("CET")
+            if not required_keys <= item.keys():
+                continue
 
-            # Strictly enforce the date range
-            if timestamp < start_dt or timestamp > end_dt:
+            # Skip activity of other products (e.g. Maps or YouTube) before
+            # doing any string work on it
+            if search_products.isdisjoint(item["products"]):
                 continue
 
             title = item["title"]
-            if title.startswith("Visited "):
-                item["title"] = title[len("Visited ") :]
-            elif title.endswith(" aufgerufen"):
-                item["title"] = title[: -len(" aufgerufen")]
-            elif title.startswith("Viewed ") or title.endswith(" angesehen"):
+            if (stripped := title.removeprefix(visited_prefix)) != title:
+                title = stripped
+            elif (stripped := title.removesuffix(visited_suffix)) != title:
+                title = stripped
+            elif title.startswith(viewed_prefixes) or title.endswith(viewed_suffixes):
                 continue  # Skip Viewed items entirely
 
-            if is_google_homepage(item["titleUrl"]):
+            url = item["titleUrl"]
+            if google_homepage_url.match(url):
                 continue  # Skip Google homepage visits
 
-            records.append(item)
-        except (ValueError, AttributeError) as e:
+            times.append(item["time"])
+            titles.append(title)
+            urls.append(url)
+        except (ValueError, AttributeError, TypeError) as e:
             continue
 
-    for i, item in enumerate(records, start=1):
-        timestamp = pd.to_datetime(item["time"])
-        date = timestamp.strftime("%d-%m-%Y")
-        index = str(i)
+    # Parse all timestamps in a single pass; unparsable ones become NaT and
+    # fail the range comparison below. They stay in UTC, the comparison with
+    # the CET bounds doesn't depend on the zone
+    timestamps = pd.to_datetime(times, utc=True, errors="coerce")
 
-        final_url = resolve_google_redirect(item["titleUrl"])
-        is_search, query = is_google_search_url(final_url)
-        if is_search:
-            searches.append({"Datum": date, "Nummer": index, "Suchbegriff": query})
-        else:
-            clicks.append(
-                {
-                    "Datum": date,
-                    "Nummer": index,
-                    "Suchergebnis": format_title(item["title"]),
-                    "Link": final_url,
-                }
-            )
+    # Strictly enforce the date range
+    in_range = (timestamps >= start_dt) & (timestamps <= end_dt)
 
-    searches_df = pd.DataFrame(searches)
-    clicks_df = pd.DataFrame(clicks)
+    # Only the kept timestamps are converted to local time for display. They
+    # fall on a few dozen days, so each day is formatted once and the labels
+    # are looked up per record instead of calling strftime for every record
+    local_times = timestamps[in_range].tz_convert("CET").tz_localize(None)
+    days, day_index = np.unique(
+        local_times.asi8 // pd.Timedelta(days=1).value, return_inverse=True
+    )
+    day_labels = pd.to_datetime(days, unit="D").strftime("%d-%m-%Y")
+    dates = day_labels[day_index]
 
-    # Ensure columns exist even if dataframes are empty
-    searches_df = searches_df.reindex(columns=["Datum", "Nummer", "Suchbegriff"])
-    clicks_df = clicks_df.reindex(columns=["Datum", "Nummer", "Suchergebnis", "Link"])
+    kept = itertools.compress(zip(titles, urls), in_range)
+    for i, ((title, url), date) in enumerate(zip(kept, dates), start=1):
+        index = str(i)
+
+        query, final_url = classify_activity_url(url)
+        if query is not None:
+            search_dates.append(date)
+            search_numbers.append(index)
+            search_terms.append(query)
+        else:
+            click_dates.append(date)
+            click_numbers.append(index)
+            click_titles.append(format_title(title))
+            click_links.append(final_url)
+
+    # Only a few dozen days fall in the range, so the dates are stored as
+    # categories; the donated JSON is the same as for plain strings
+    searches_df = pd.DataFrame(
+        {
+            "Datum": pd.Categorical(search_dates),
+            "Nummer": search_numbers,
+            "Suchbegriff": search_terms,
+        }
+    )
+    clicks_df = pd.DataFrame(
+        {
+            "Datum": pd.Categorical(click_dates),
+            "Nummer": click_numbers,
+            "Suchergebnis": click_titles,
+            "Link": click_links,
+        }
+    )
 
     return searches_df, clicks_df
 
@@ -405,10 +534,23 @@ class NoGoogleSearchDataError(Exception):
     pass
 
 
+def is_search_activity(item):
+    """Check whether a Takeout activity record belongs to Google Search"""
+    try:
+        return required_keys <= item.keys() and not search_products.isdisjoint(
+            item["products"]
+        )
+    except (KeyError, AttributeError, TypeError):
+        return False
+
+
 def parse_google_search_json(file_obj):
     """
     Parse Google Search data from a JSON file.
 
+    Only Google Search records are kept, so activity of other products in the
+    same file is dropped right after decoding.
+
     Args:
         file_obj: File object containing JSON data
 
@@ -417,24 +559,194 @@ def parse_google_search_json(file_obj):
         None: If no valid search data is found
     """
     try:
-        data = json.load(file_obj)
-    except json.JSONDecodeError:
+        items = json.load(file_obj)
+    except (json.JSONDecodeError, UnicodeDecodeError):
         return None
 
-    try:
-        if isinstance(data, list) and len(data) > 0:
-            first_item = data[0]
-            if all(
-                key in first_item
-                for key in ["header", "title", "time", "products", "titleUrl"]
-            ) and any(
-                product in ["Search", "Google Suche"]
-                for product in first_item["products"]
-            ):
-                return data
-    except (KeyError, AttributeError, TypeError):
-        pass
-    return None
+    # The first record decides whether this is a search history at all
+    if not isinstance(items, list) or not items or not is_search_activity(items[0]):
+        return None
+    return [item for item in items if is_search_activity(item)]
+
+
+# Timestamp of a My Activity HTML entry, e.g. "10.01.2025, 17:21:55 MEZ"
+html_timestamp = re.compile(
+    r"(?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4}), "
+    r"(?P<time>\d{1,2}:\d{2}:\d{2}) (?P<zone>MEZ|MESZ)"
+)
+zone_offsets = {"MEZ": "+01:00", "MESZ": "+02:00"}
+
+# Zone names of other page languages, left to dateutil; all of them are the
+# German time zone, with the offset taken from the date
+html_tzinfos = {
+    "MEZ": german_tz,
+    "MESZ": german_tz,
+    "CET": german_tz,
+    "CEST": german_tz,
+}
+
+
+def parse_html_timestamps(raw_times):
+    """
+    Parse the timestamps of My Activity HTML entries.
+
+    The German "DD.MM.YYYY, HH:MM:SS MEZ" form is rewritten to ISO 8601,
+    which pandas validates for all entries in a single call. Anything else
+    falls back to dateutil, one entry at a time.
+
+    Args:
+        raw_times: List of timestamp strings as shown on the page
+
+    Returns:
+        list: ISO 8601 strings, or None where a timestamp could not be parsed
+    """
+    if not raw_times:
+        return []
+
+    iso_times = []
+    for raw_time in raw_times:
+        match = html_timestamp.fullmatch(raw_time)
+        if match is None:
+            iso_times.append(None)
+            continue
+        iso_times.append(
+            f"{match['year']}-{match['month']:0>2}-{match['day']:0>2}"
+            f"T{match['time']:0>8}{zone_offsets[match['zone']]}"
+        )
+
+    # Catches dates that match the pattern but don't exist, e.g. 31.02.
+    valid = pd.to_datetime(iso_times, utc=True, errors="coerce").notna()
+
+    parsed = []
+    for raw_time, iso_time, is_valid in zip(raw_times, iso_times, valid):
+        if is_valid:
+            parsed.append(iso_time)
+            continue
+        try:
+            timestamp = dateutil.parser.parse(
+                raw_time, tzinfos=html_tzinfos, dayfirst=True
+            )
+        except (dateutil.parser.ParserError, OverflowError):
+            parsed.append(None)
+            continue
+        # A time without a zone is the local time the page was written in;
+        # explicit offsets are converted to it like the German timestamps
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=german_tz)
+        parsed.append(timestamp.astimezone(german_tz).isoformat())
+    return parsed
+
+
+# Headers of My Activity HTML entries that belong to Google Search
+search_headers = frozenset(["Google Suche", "Search"])
+
+# Number of characters fed to the HTML parser at a time
+html_chunk_length = 1024 * 1024
+
+
+class SearchActivityParser(HTMLParser):
+    """
+    Collect the Google Search entries of a My Activity HTML page.
+
+    Every outer-cell entry is reduced to its header text, the href of the
+    first link in its first content cell and the stripped strings of that
+    content cell as soon as the entry is closed. The page can therefore be fed
+    in chunks without a document tree ever being built.
+
+    Attributes:
+        rows: (header, title, title_url, raw_time) for every search entry
+    """
+
+    def __init__(self):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.rows = []
+        self._divs = []  # roles of the divs open inside the current entry
+        self._text = []  # text seen since the last tag
+        self._start_entry()
+
+    def _start_entry(self):
+        self._header = None
+        self._content = None
+        self._title_url = None
+        self._in_header = False
+        self._in_content = False
+
+    def _end_entry(self):
+        if self._header is None or self._content is None:
+            return
+
+        header = "".join(self._header)
+        parts = self._content
+        if header in search_headers and len(parts) == 3:
+            title = " ".join(parts[:-1])
+            self.rows.append((header, title, self._title_url or "", parts[-1]))
+
+    def _flush_text(self):
+        # Text split by a chunk boundary arrives in several pieces; it is only
+        # complete once the next tag starts
+        if not self._text:
+            return
+        text = "".join(self._text).strip()
+        self._text = []
+        if text and self._in_header:
+            self._header.append(text)
+        if text and self._in_content:
+            self._content.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag == "a":
+            if self._in_content and self._title_url is None:
+                self._title_url = dict(attrs).get("href") or ""
+            return
+        if tag != "div":
+            return
+
+        classes = (dict(attrs).get("class") or "").split()
+        role = None
+        if not self._divs:
+            if "outer-cell" not in classes:
+                return
+            role = "outer"
+        elif "header-cell" in classes and self._header is None:
+            role = "header"
+            self._header = []
+            self._in_header = True
+        elif "content-cell" in classes and self._content is None:
+            role = "content"
+            self._content = []
+            self._in_content = True
+        self._divs.append(role)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag != "div" or not self._divs:
+            return
+
+        role = self._divs.pop()
+        if role == "header":
+            self._in_header = False
+        elif role == "content":
+            self._in_content = False
+        elif role == "outer":
+            self._end_entry()
+            self._start_entry()
+
+    def handle_data(self, data):
+        if self._in_header or self._in_content:
+            self._text.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def close(self):
+        HTMLParser.close(self)
+        self._flush_text()
+        # Like a browser, close an entry left open at the end of the page
+        if self._divs:
+            self._divs = []
+            self._end_entry()
+            self._start_entry()
 
 
 def parse_google_search_html(html_content):
@@ -442,70 +754,89 @@ def parse_google_search_html(html_content):
     Parse Google Search data from an HTML file.
 
     Args:
-        html_content: String containing HTML content
+        html_content: String or text file object containing HTML content
 
     Returns:
         list: The parsed activity data if valid search data is found
         None: If no valid search data is found
     """
-    soup = BeautifulSoup(html_content, "html.parser")
+    parser = SearchActivityParser()
+    if isinstance(html_content, str):
+        parser.feed(html_content)
+    else:
+        for chunk in iter(lambda: html_content.read(html_chunk_length), ""):
+            parser.feed(chunk)
+    parser.close()
+
+    if not parser.rows:
+        return None
 
-    activities = []
+    headers, titles, title_urls, raw_times = zip(*parser.rows)
+    activities = [
+        {
+            "header": header,
+            "title": title,
+            "titleUrl": title_url,
+            "time": time,
+            "products": ["Google Suche"],
+        }
+        for header, title, title_url, time in zip(
+            headers, titles, title_urls, parse_html_timestamps(list(raw_times))
+        )
+        if time is not None
+    ]
 
-    # Find all activity entries
-    for cell in soup.find_all("div", class_="outer-cell"):
-        try:
-            # Get header (activity type)
-            try:
-                header_elem = cell.select(".header-cell")[0]
-            except IndexError:
-                continue
+    return activities if activities else None
 
-            header = header_elem.get_text(strip=True)
-            if header not in ["Google Suche", "Search"]:
-                continue
 
-            # Get content
-            try:
-                content = cell.select(".content-cell")[0]
-            except IndexError:
-                continue
+# Location of the search history inside a Takeout archive, e.g.
+# "Takeout/My Activity/Search/MyActivity.json" or its German and Dutch
+# counterparts "Meine Aktivitäten/Google Suche" and "Mijn activiteit/Google
+# Zoeken"; the product folder may or may not carry the "Google " prefix
+search_history_path = re.compile(
+    r"(?:My ?Activity|Meine ?Aktivit(?:ä|a\u0308|ae)ten|Mijn ?activiteit)/"
+    r"(?:Google )?(?:Search|Suche|Zoeken)/[^/]+\.(?:json|html)$",
+    re.IGNORECASE,
+)
 
-            # Extract URL before removing the link
-            link = content.find("a")
-            title_url = ""
-            if link and "href" in link.attrs:
-                title_url = link["href"]
+# Activity of any product inside a Takeout archive, e.g.
+# "Takeout/My Activity/YouTube/MyActivity.json"
+activity_path = re.compile(
+    r"(?:My ?Activity|Meine ?Aktivit(?:ä|a\u0308|ae)ten|Mijn ?activiteit)/[^/]+/",
+    re.IGNORECASE,
+)
 
-            parts = list(content.stripped_strings)
 
-            if len(parts) == 3:
-                title = " ".join(parts[:-1])
+def candidate_rank(name):
+    """
+    Rank an archive member by how likely it holds the search history.
 
-                try:
-                    timestamp = dateutil.parser.parse(
-                        parts[-1],
-                        tzinfos={
-                            "MEZ": german_tz,
-                        },
-                        dayfirst=True,
-                    )
-                except dateutil.parser.ParserError:
-                    continue
+    Known search history locations come first, activity of other products
+    (Maps, YouTube, ...) last, since it has the same shape as the search
+    history but can be much larger.
+    """
+    if search_history_path.search(name):
+        return 0
+    if activity_path.search(name):
+        return 2
+    return 1
 
-                activity = {
-                    "header": header,
-                    "title": title,
-                    "titleUrl": title_url,
-                    "time": timestamp.isoformat(),
-                    "products": ["Google Suche"],
-                }
-                activities.append(activity)
 
-        except (AttributeError, IndexError, KeyError) as e:
-            continue
+# Number of bytes read from a JSON member to decide whether it is worth
+# decoding in full
+json_probe_length = 8 * 1024
 
-    return activities if activities else None
+
+def looks_like_activity_json(head):
+    """Check if the first bytes of a JSON file look like a Takeout activity list"""
+    return (
+        head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"[") and b'"products"' in head
+    )
+
+
+# Number of bytes at the start of an HTML file that are searched for the
+# Google marker; Takeout pages mention Google in their head
+google_marker_scan_length = 64 * 1024
 
 
 def find_google_search_export(zipfile_ref):
@@ -526,41 +857,58 @@ def find_google_search_export(zipfile_ref):
 
     logger.info("Searching for Google Search data in zip file")
 
-    # First try JSON files
-    json_files = [f for f in zipfile_ref.namelist() if f.lower().endswith(".json")]
-    for file in json_files:
-        try:
-            with zipfile_ref.open(file) as f:
-                data = parse_google_search_json(f)
-                if data:
-                    logger.info(f"Found Google Search data in {file}")
-                    return data
-        except (zipfile.BadZipFile, IOError, UnicodeDecodeError) as e:
+    # Split the central directory in a single pass; empty members (including
+    # directories) can't hold any data
+    json_files, html_files = [], []
+    for info in zipfile_ref.infolist():
+        if info.file_size == 0:
             continue
-
-    # Try HTML files
-    html_files = [f for f in zipfile_ref.namelist() if f.lower().endswith(".html")]
-    for file in html_files:
+        extension = info.filename[-5:].lower()
+        if extension == ".json":
+            json_files.append(info.filename)
+        elif extension == ".html":
+            html_files.append(info.filename)
+
+    # JSON before HTML, and the known search history locations before
+    # everything else, so that typically only a single file is parsed
+    candidates = json_files + html_files
+    candidates.sort(key=candidate_rank)
+
+    is_google_takeout = False
+    for file in candidates:
         try:
-            with zipfile_ref.open(file) as f:
-                html_content = f.read().decode("utf-8")
-                data = parse_google_search_html(html_content)
-                if data:
-                    logger.info(f"Found Google Search data in {file}")
-                    return data
+            if file.lower().endswith(".json"):
+                with zipfile_ref.open(file) as f:
+                    head = f.read(json_probe_length)
+                    if not looks_like_activity_json(head):
+                        continue
+                    # Rewinding only re-inflates the probed head; gluing the
+                    # head to the rest would copy the whole file once more
+                    f.seek(0)
+                    data = parse_google_search_json(f)
+            else:
+                # Decoded and parsed while it is decompressed, so the page is
+                # never held in memory as a whole
+                with zipfile_ref.open(file) as f:
+                    data = parse_google_search_html(
+                        io.TextIOWrapper(f, encoding="utf-8", newline="")
+                    )
+                # One page mentioning Google is enough to tell a Takeout
+                # archive apart, later pages are not checked again
+                if not data and not is_google_takeout:
+                    with zipfile_ref.open(file) as f:
+                        head = f.read(google_marker_scan_length)
+                    is_google_takeout = b"Google" in head
+
+            if data:
+                logger.info(f"Found Google Search data in {file}")
+                return data
         except (zipfile.BadZipFile, IOError, UnicodeDecodeError) as e:
             continue
 
-    # Check if this is a Google Takeout archive
-    for html_file in html_files:
-        try:
-            with zipfile_ref.open(html_file) as f:
-                content = f.read().decode("utf-8")
-                if "Google" in content:
-                    logger.error("Google Takeout archive found but no search data")
-                    raise NoGoogleSearchDataError()
-        except (zipfile.BadZipFile, IOError, UnicodeDecodeError) as e:
-            continue
+    if is_google_takeout:
+        logger.error("Google Takeout archive found but no search data")
+        raise NoGoogleSearchDataError()
 
     logger.error("No valid Google Takeout data found in zip file")
     raise GoogleTakeoutNotFoundError("No valid Google Takeout data found in zip file")
@@ -1,20 +1,25 @@
 import pytest
 import json
+import logging
+import re
 import pandas as pd
 from port.script import (
+    DataFrameHandler,
     extract_search_data,
     is_google_search_url,
     GoogleTakeoutNotFoundError,
     NoGoogleSearchDataError,
+    candidate_rank,
     find_google_search_export,
     parse_google_search_json,
     parse_google_search_html,
+    parse_html_timestamps,
 )
 import zipfile
 from io import BytesIO, StringIO
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_search_data():
     return [
         {
@@ -41,7 +46,7 @@ def sample_search_data():
     ]
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def expected_columns():
     return {
         "searches": ["Datum", "Nummer", "Suchbegriff"],
@@ -49,12 +54,15 @@ def expected_columns():
     }
 
 
+# Date format of the Datum column (DD-MM-YYYY)
+datum_format = re.compile(r"^[0-9]{2}-[0-9]{2}-[0-9]{4}$")
+
+
 def assert_dataframe_structure(df, expected_cols, df_type="searches"):
     """Helper function to verify dataframe structure and format"""
     assert list(df.columns) == expected_cols
     if len(df) > 0:
-        # Check date format (DD-MM-YYYY)
-        assert all(df["Datum"].str.match(r"^[0-9]{2}-[0-9]{2}-[0-9]{4}$"))
+        assert all(df["Datum"].str.match(datum_format))
 
 
 def test_extract_search_data(sample_search_data, expected_columns):
@@ -121,7 +129,6 @@ def test_extract_search_data_viewed_items_skipped():
             "products": ["Search"],
         },
     ]
-    from port.script import extract_search_data
 
     searches_df, clicks_df = extract_search_data(data)
     assert len(searches_df) == 1
@@ -146,13 +153,13 @@ def test_extract_search_data_visited_items_processed():
             "products": ["Search"],
         },
     ]
-    from port.script import extract_search_data
 
     searches_df, clicks_df = extract_search_data(data)
     assert len(searches_df) == 0
     assert len(clicks_df) == 1
     assert clicks_df["Suchergebnis"].iloc[0] == "example website"
     assert clicks_df["Link"].iloc[0] == "https://example.com"
+    assert data[0]["title"] == "Visited example website"
 
 
 @pytest.mark.parametrize(
@@ -167,6 +174,7 @@ def test_extract_search_data_visited_items_processed():
             "test query",
         ),
         ("https://www.google.de/search?q=m%C3%BCnchen", "münchen"),
+        ("HTTPS://www.google.com/search?q=test", "test"),
     ],
 )
 def test_is_google_search_url_valid_cases(url, expected_query):
@@ -183,6 +191,7 @@ def test_is_google_search_url_valid_cases(url, expected_query):
         "https://www.example.com/search?q=test",
         "https://maps.google.com/search?q=test",
         "https://not-google.com/search?q=test",
+        "https://WWW.GOOGLE.com/search?q=test",
         "invalid_url",
         "",
         None,
@@ -194,7 +203,7 @@ def test_is_google_search_url_invalid_cases(url):
     assert query == None
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def takeout_json_data():
     """Base fixture for Google Takeout JSON data"""
     return {
@@ -206,93 +215,114 @@ def takeout_json_data():
     }
 
 
-@pytest.fixture
-def valid_takeout_zip(takeout_json_data):
+def zip_bytes(members):
+    """Build a zip archive in memory; test data is stored uncompressed"""
     zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zf:
-        zf.writestr("Takeout/MyActivity.json", json.dumps([takeout_json_data]))
-    zip_buffer.seek(0)
-    return zipfile.ZipFile(zip_buffer)
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as zf:
+        for name, content in members.items():
+            zf.writestr(name, content)
+    return zip_buffer.getvalue()
+
+
+def make_zip(members):
+    """Build a read-only zip archive in memory"""
+    return zipfile.ZipFile(BytesIO(zip_bytes(members)))
+
+
+@pytest.fixture(scope="session")
+def valid_takeout_zip_bytes(takeout_json_data):
+    return zip_bytes({"Takeout/MyActivity.json": json.dumps([takeout_json_data])})
 
 
 @pytest.fixture
-def invalid_zip():
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zf:
-        # Add JSON with wrong structure
-        invalid_data = [{"wrong": "structure"}]
-        zf.writestr("some_file.json", json.dumps(invalid_data))
-    zip_buffer.seek(0)
-    return zipfile.ZipFile(zip_buffer)
+def valid_takeout_zip(valid_takeout_zip_bytes):
+    return zipfile.ZipFile(BytesIO(valid_takeout_zip_bytes))
+
+
+@pytest.fixture(scope="session")
+def invalid_zip_bytes():
+    # JSON with wrong structure
+    invalid_data = [{"wrong": "structure"}]
+    return zip_bytes({"some_file.json": json.dumps(invalid_data)})
 
 
 @pytest.fixture
-def multiple_json_zip(takeout_json_data):
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zf:
-        # Add invalid JSON first
-        invalid_data = [{"wrong": "structure"}]
-        zf.writestr("invalid.json", json.dumps(invalid_data))
+def invalid_zip(invalid_zip_bytes):
+    return zipfile.ZipFile(BytesIO(invalid_zip_bytes))
 
-        # Add valid Google Takeout JSON
-        zf.writestr("Takeout/MyActivity.json", json.dumps([takeout_json_data]))
-    zip_buffer.seek(0)
-    return zipfile.ZipFile(zip_buffer)
+
+@pytest.fixture(scope="session")
+def multiple_json_zip_bytes(takeout_json_data):
+    invalid_data = [{"wrong": "structure"}]
+    return zip_bytes(
+        {
+            # Invalid JSON first, then the valid Google Takeout JSON
+            "invalid.json": json.dumps(invalid_data),
+            "Takeout/MyActivity.json": json.dumps([takeout_json_data]),
+        }
+    )
 
 
 @pytest.fixture
-def maps_data_zip():
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zf:
-        # Sample of the Maps data
-        maps_data = [
-            {
-                "header": "Maps",
-                "title": "Heidelberg Castle",
-                "titleUrl": "https://www.google.com/maps/place/Heidelberg+Castle/@49.4106196,8.7153092,16z/data=!3m1!4b1!4m2!3m1!1s0x4797c100ca43db93:0x6d672e3649e97eea",
-                "time": "2025-01-08T09:34:22.644Z",
-                "products": ["Maps"],
-                "activityControls": ["Web & App Activity"],
-            },
-            {
-                "header": "Maps",
-                "title": "Searched for tea",
-                "titleUrl": "https://www.google.com/maps/search/tea/@49.4091535,8.6775828,15z/data=!3m1!4b1",
-                "time": "2025-01-08T09:31:59.365Z",
-                "products": ["Maps"],
-                "activityControls": ["Web & App Activity"],
-                "locationInfos": [
-                    {
-                        "name": "At this general area",
-                        "url": "https://www.google.com/maps/@?api=1&map_action=map&center=49.328947,8.752333&zoom=10",
-                        "source": "Based on your past activity",
-                    }
-                ],
-            },
-        ]
-        zf.writestr("Takeout/Maps/MyActivity.json", json.dumps(maps_data))
-    zip_buffer.seek(0)
-    return zipfile.ZipFile(zip_buffer)
+def multiple_json_zip(multiple_json_zip_bytes):
+    return zipfile.ZipFile(BytesIO(multiple_json_zip_bytes))
+
+
+@pytest.fixture(scope="session")
+def maps_data_zip_bytes():
+    # Sample of the Maps data
+    maps_data = [
+        {
+            "header": "Maps",
+            "title": "Heidelberg Castle",
+            "titleUrl": "https://www.google.com/maps/place/Heidelberg+Castle/@49.4106196,8.7153092,16z/data=!3m1!4b1!4m2!3m1!1s0x4797c100ca43db93:0x6d672e3649e97eea",
+            "time": "2025-01-08T09:34:22.644Z",
+            "products": ["Maps"],
+            "activityControls": ["Web & App Activity"],
+        },
+        {
+            "header": "Maps",
+            "title": "Searched for tea",
+            "titleUrl": "https://www.google.com/maps/search/tea/@49.4091535,8.6775828,15z/data=!3m1!4b1",
+            "time": "2025-01-08T09:31:59.365Z",
+            "products": ["Maps"],
+            "activityControls": ["Web & App Activity"],
+            "locationInfos": [
+                {
+                    "name": "At this general area",
+                    "url": "https://www.google.com/maps/@?api=1&map_action=map&center=49.328947,8.752333&zoom=10",
+                    "source": "Based on your past activity",
+                }
+            ],
+        },
+    ]
+    return zip_bytes({"Takeout/Maps/MyActivity.json": json.dumps(maps_data)})
 
 
 @pytest.fixture
-def search_product_zip():
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zf:
-        # Add valid Google Takeout JSON with "Search" product
-        valid_data = [
-            {
-                "header": "Search",
-                "title": "Searched for heidelberg castle",
-                "titleUrl": "https://www.google.com/search?q=heidelberg+castle",
-                "time": "2025-01-08T09:34:46.043Z",
-                "products": ["Search"],
-                "activityControls": ["Web & App Activity"],
-            }
-        ]
-        zf.writestr("Takeout/MyActivity.json", json.dumps(valid_data))
-    zip_buffer.seek(0)
-    return zipfile.ZipFile(zip_buffer)
+def maps_data_zip(maps_data_zip_bytes):
+    return zipfile.ZipFile(BytesIO(maps_data_zip_bytes))
+
+
+@pytest.fixture(scope="session")
+def search_product_zip_bytes():
+    # Valid Google Takeout JSON with "Search" product
+    valid_data = [
+        {
+            "header": "Search",
+            "title": "Searched for heidelberg castle",
+            "titleUrl": "https://www.google.com/search?q=heidelberg+castle",
+            "time": "2025-01-08T09:34:46.043Z",
+            "products": ["Search"],
+            "activityControls": ["Web & App Activity"],
+        }
+    ]
+    return zip_bytes({"Takeout/MyActivity.json": json.dumps(valid_data)})
+
+
+@pytest.fixture
+def search_product_zip(search_product_zip_bytes):
+    return zipfile.ZipFile(BytesIO(search_product_zip_bytes))
 
 
 def assert_google_search_export(data):
@@ -305,29 +335,75 @@ def assert_google_search_export(data):
 
 
 def test_find_google_search_export_valid(valid_takeout_zip):
-    from port.script import find_google_search_export
-
     data = find_google_search_export(valid_takeout_zip)
     assert_google_search_export(data)
 
 
 def test_find_google_search_export_invalid(invalid_zip):
-    from port.script import find_google_search_export, GoogleTakeoutNotFoundError
-
     with pytest.raises(GoogleTakeoutNotFoundError):
         find_google_search_export(invalid_zip)
 
 
 def test_find_google_search_export_multiple(multiple_json_zip):
-    from port.script import find_google_search_export
-
     data = find_google_search_export(multiple_json_zip)
     assert_google_search_export(data)
 
 
-def test_find_google_search_export_empty_zip():
-    from port.script import find_google_search_export, GoogleTakeoutNotFoundError
+@pytest.mark.parametrize(
+    "search_path",
+    [
+        "Takeout/My Activity/Search/MyActivity.json",
+        "Takeout/Meine Aktivitäten/Google Suche/MeineAktivitäten.json",
+        "Takeout/Mijn activiteit/Google Zoeken/MijnActiviteit.json",
+    ],
+)
+def test_find_google_search_export_prefers_search_history_path(
+    takeout_json_data, search_path
+):
+    other_data = dict(takeout_json_data, titleUrl="https://www.google.com/search?q=x")
+    zf = make_zip(
+        {
+            "Takeout/Other/MyActivity.json": json.dumps([other_data]),
+            search_path: json.dumps([takeout_json_data]),
+        }
+    )
+
+    data = find_google_search_export(zf)
+    assert data == [takeout_json_data]
+
+
+def test_find_google_search_export_tries_other_activity_last(takeout_json_data):
+    other_data = dict(takeout_json_data, titleUrl="https://www.google.com/search?q=x")
+    zf = make_zip(
+        {
+            "Takeout/My Activity/YouTube/MyActivity.json": json.dumps([other_data]),
+            "Takeout/MyActivity.json": json.dumps([takeout_json_data]),
+        }
+    )
+
+    data = find_google_search_export(zf)
+    assert data == [takeout_json_data]
+
+
+@pytest.mark.parametrize(
+    "search_path, other_path",
+    [
+        (
+            "Takeout/Meine Aktivitäten/Google Suche/MeineAktivitäten.html",
+            "Takeout/Meine Aktivitäten/YouTube/MeineAktivitäten.html",
+        ),
+        (
+            "Takeout/Mijn activiteit/Google Zoeken/MijnActiviteit.html",
+            "Takeout/Mijn activiteit/YouTube/MijnActiviteit.html",
+        ),
+    ],
+)
+def test_candidate_rank_search_history_before_other_activity(search_path, other_path):
+    names = sorted([other_path, "Takeout/index.html", search_path], key=candidate_rank)
+    assert names == [search_path, "Takeout/index.html", other_path]
+
 
+def test_find_google_search_export_empty_zip():
     empty_buffer = BytesIO()
     with zipfile.ZipFile(empty_buffer, "w") as zf:
         pass  # Create empty zip
@@ -339,15 +415,11 @@ def test_find_google_search_export_empty_zip():
 
 
 def test_find_google_search_export_maps_data(maps_data_zip):
-    from port.script import find_google_search_export, GoogleTakeoutNotFoundError
-
     with pytest.raises(GoogleTakeoutNotFoundError):
         find_google_search_export(maps_data_zip)
 
 
 def test_find_google_search_export_search_product(search_product_zip):
-    from port.script import find_google_search_export
-
     data = find_google_search_export(search_product_zip)
     assert_google_search_export(data)
     assert data[0]["products"] == ["Search"]
@@ -363,7 +435,6 @@ def test_extract_search_data_with_google_redirect_url():
             "products": ["Google Suche"],
         }
     ]
-    from port.script import extract_search_data
 
     searches_df, clicks_df = extract_search_data(data)
     assert len(searches_df) == 0
@@ -465,6 +536,29 @@ def test_extract_search_data_url_titles():
     ]
 
 
+def test_extract_search_data_skips_other_products():
+    data = [
+        {
+            "header": "YouTube",
+            "title": "Watched a video",
+            "titleUrl": "https://www.youtube.com/watch?v=123",
+            "time": "2025-02-09T14:39:34.364Z",
+            "products": ["YouTube"],
+        },
+        {
+            "header": "Search",
+            "title": "Searched for cookies",
+            "titleUrl": "https://www.google.com/search?q=cookies",
+            "time": "2025-02-09T14:40:00.000Z",
+            "products": ["Search"],
+        },
+    ]
+    searches_df, clicks_df = extract_search_data(data)
+    assert searches_df["Suchbegriff"].tolist() == ["cookies"]
+    assert searches_df["Nummer"].tolist() == ["1"]
+    assert len(clicks_df) == 0
+
+
 def test_find_google_search_export_empty_google_takeout():
     """Test detection of Google Takeout archives that don't contain search data"""
     zip_buffer = BytesIO()
@@ -499,7 +593,6 @@ def test_extract_search_data_german_viewed_items():
             "products": ["Search"],
         },
     ]
-    from port.script import extract_search_data
 
     searches_df, clicks_df = extract_search_data(data)
     assert len(searches_df) == 1
@@ -524,7 +617,6 @@ def test_extract_search_data_german_clicked_items():
             "products": ["Search"],
         },
     ]
-    from port.script import extract_search_data
 
     searches_df, clicks_df = extract_search_data(data)
     assert len(searches_df) == 0
@@ -570,6 +662,36 @@ def test_parse_google_search_json_invalid():
         assert data is None
 
 
+def test_parse_google_search_json_keeps_only_search_records():
+    records = [
+        {
+            "header": "Google Suche",
+            "title": "Test search",
+            "titleUrl": "https://www.google.com/search?q=test",
+            "time": "2025-01-09T14:39:34.364Z",
+            "products": ["Google Suche"],
+        },
+        {
+            "header": "Maps",
+            "title": "Heidelberg Castle",
+            "titleUrl": "https://www.google.com/maps/place/Heidelberg+Castle",
+            "time": "2025-01-09T14:40:00.000Z",
+            "products": ["Maps"],
+        },
+        {"header": "Search", "title": "Missing fields"},
+        {
+            "header": "Search",
+            "title": "Searched for cookies",
+            "titleUrl": "https://www.google.com/search?q=cookies",
+            "time": "2025-01-09T14:41:00.000Z",
+            "products": ["Search"],
+        },
+    ]
+
+    data = parse_google_search_json(BytesIO(json.dumps(records, indent=2).encode()))
+    assert data == [records[0], records[3]]
+
+
 def test_parse_google_search_html_valid_query():
     valid_html = """
     <!DOCTYPE html>
@@ -744,12 +866,74 @@ def test_html_parser_uses_day_first_logic_for_dates():
     assert data[0]["time"] == "2025-01-09T15:39:46+01:00"
 
 
-def test_dont_include_google_in_results():
+def test_html_parser_handles_summer_time():
+    html = """
+    <div class="outer-cell mdl-cell mdl-cell--12-col mdl-shadow--2dp">
+      <div class="header-cell mdl-cell mdl-cell--12-col">
+        <p class="mdl-typography--title">Google Suche<br /></p>
+      </div>
+      <div class="content-cell mdl-cell mdl-cell--6-col mdl-typography--body-1">
+        Gesucht nach: <a href="https://www.google.com/search?q=fruehling"
+          >fruehling</a
+        ><br />01.04.2025, 10:15:00 MESZ
+      </div>
+    </div>
+    """
+    data = parse_google_search_html(html)
+    assert data[0]["time"] == "2025-04-01T10:15:00+02:00"
+
+
+def test_html_parser_keeps_stated_offset_when_clocks_go_back():
+    html = """
+    <div class="outer-cell">
+      <div class="header-cell"><p>Google Suche<br /></p></div>
+      <div class="content-cell">
+        Gesucht nach: <a href="https://www.google.com/search?q=zeitumstellung"
+          >zeitumstellung</a
+        ><br />27.10.2024, 02:30:00 MEZ
+      </div>
+    </div>
+    """
+    data = parse_google_search_html(html)
+    assert data[0]["time"] == "2024-10-27T02:30:00+01:00"
+
+
+@pytest.mark.parametrize(
+    "raw_time, expected_time",
+    [
+        ("Jan 9, 2025, 3:39:46 PM CET", "2025-01-09T15:39:46+01:00"),
+        ("Jul 1, 2025, 10:00:00 AM CEST", "2025-07-01T10:00:00+02:00"),
+        ("Jan 9, 2025, 2:39:46 PM +0000", "2025-01-09T15:39:46+01:00"),
+        ("9 Jan 2025, 16:39:46 +0200", "2025-01-09T15:39:46+01:00"),
+    ],
+)
+def test_parse_html_timestamps_other_locales(raw_time, expected_time):
+    assert parse_html_timestamps([raw_time]) == [expected_time]
+
+
+def test_html_parser_reads_file_in_chunks(monkeypatch):
+    html = """
+    <div class="outer-cell">
+      <div class="header-cell"><p>Google Suche<br /></p></div>
+      <div class="content-cell">
+        Gesucht nach: <a href="https://www.google.com/search?q=schnee"
+          >schnee</a
+        ><br />09.01.2025, 15:39:46 MEZ
+      </div>
+    </div>
+    """
+    # Split the page mid-tag and mid-text
+    monkeypatch.setattr("port.script.html_chunk_length", 7)
+    assert parse_google_search_html(StringIO(html)) == parse_google_search_html(html)
+
+
+@pytest.mark.parametrize("url", ["https://www.google.com", "HTTPS://www.google.de/"])
+def test_dont_include_google_in_results(url):
     data = [
         {
             "header": "Google Suche",
             "title": "Some search",
-            "titleUrl": "https://www.google.com",
+            "titleUrl": url,
             "time": "2025-02-09T14:39:34.364Z",
             "products": ["Google Suche"],
         }
@@ -818,3 +1002,69 @@ def test_html_detects_search_data():
             ),
         )
         assert find_google_search_export(zf) is not None
+
+
+def test_find_google_search_export_english_html():
+    html = """
+    <!DOCTYPE html>
+    <html>
+    <head><title>Google Account - My Activity</title></head>
+    <body>
+        <div class="outer-cell mdl-cell mdl-cell--12-col mdl-shadow--2dp">
+        <div class="mdl-grid">
+        <div class="header-cell mdl-cell mdl-cell--12-col">
+            <p class="mdl-typography--title">Search<br /></p>
+        </div>
+        <div class="content-cell mdl-cell mdl-cell--6-col mdl-typography--body-1">
+            Searched for <a href="https://www.google.com/search?q=snow"
+            >snow</a
+            ><br />Jan 9, 2025, 3:39:46 PM CET
+        </div>
+        </div>
+        </div>
+    </body>
+    </html>
+    """
+    zf = make_zip({"Takeout/My Activity/Search/MyActivity.html": html})
+
+    data = find_google_search_export(zf)
+    assert len(data) == 1
+    assert data[0]["title"] == "Searched for snow"
+    assert data[0]["titleUrl"] == "https://www.google.com/search?q=snow"
+    assert data[0]["time"] == "2025-01-09T15:39:46+01:00"
+
+
+def test_find_google_search_export_html_keeps_crlf_in_titles():
+    html = (
+        '<div class="outer-cell mdl-cell mdl-cell--12-col mdl-shadow--2dp">'
+        '<div class="header-cell mdl-cell mdl-cell--12-col">'
+        '<p class="mdl-typography--title">Google Suche<br /></p></div>'
+        '<div class="content-cell mdl-cell mdl-cell--6-col mdl-typography--body-1">'
+        'Gesucht nach <a href="https://www.google.com/search?q=a+b">a\r\nb</a>'
+        "<br />10.01.2025, 17:21:55 MEZ</div></div>"
+    )
+    zf = make_zip(
+        {"Takeout/Meine Aktivitäten/Google Suche/MeineAktivitäten.html": html}
+    )
+
+    data = find_google_search_export(zf)
+    assert data == parse_google_search_html(html)
+    assert data[0]["title"] == "Gesucht nach a\r\nb"
+
+
+def test_log_handler_as_dict_matches_df():
+    handler = DataFrameHandler()
+    logger = logging.getLogger("test_log_handler_as_dict_matches_df")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    logger.info("first")
+    logger.error("second")
+    logger.removeHandler(handler)
+
+    payload = handler.as_dict()
+    assert payload == {
+        "Level": {0: "INFO", 1: "ERROR"},
+        "Message": {0: "first", 1: "second"},
+    }
+    assert handler.df.to_dict() == payload
+    json.dumps(payload)
@@ -93,7 +93,7 @@ function startPyodide() {
 
 function loadPackages() {
   console.log('[ProcessingWorker] loading packages')
-  return self.pyodide.loadPackage(['micropip', 'numpy', 'pandas', 'beautifulsoup4', 'python-dateutil'])
+  return self.pyodide.loadPackage(['micropip', 'numpy', 'pandas', 'python-dateutil'])
 }
 
 function installPortPackage() {